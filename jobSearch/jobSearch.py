@@ -1,11 +1,24 @@
 import os
+import re
 import json
-from typing import Any
+import logging
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import functools
+from typing import Any, Optional
 
+import faiss
 import httpx
+import numpy as np
+import orjson
+import spacy
 from dotenv import load_dotenv
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
 from mcp.server.fastmcp import FastMCP
+from sentence_transformers import SentenceTransformer
 
 # Load environment variables
 load_dotenv()
@@ -13,67 +26,479 @@ load_dotenv()
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 SCRAPINGDOG_API_KEY = os.getenv("SCRAPINGDOG_API_KEY")
 
-anthropic = Anthropic(api_key=ANTHROPIC_API_KEY)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+CLAUDE_MODEL = "claude-3-5-haiku-latest"
+PROFILE_MAX_TOKENS = 256
+# One retry gets this much room when a long profile overruns PROFILE_MAX_TOKENS
+PROFILE_RETRY_MAX_TOKENS = 1024
+FILES_API_BETA = "files-api-2025-04-14"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite3"))
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+# ~180 words stays under the model's 256 word-piece limit
+EMBEDDING_CHUNK_WORDS = 180
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+CHEAP_PARSE_MIN_CONFIDENCE = 0.8
+CV_TOKEN_BUDGET = 4000
+SKILL_VOCAB = [
+    "Python", "Java", "JavaScript", "TypeScript", "C++", "C#", "Golang", "Rust", "Ruby",
+    "PHP", "Kotlin", "Swift", "Scala", "SQL", "Bash", "HTML", "CSS",
+    "React", "Angular", "Vue", "Next.js", "Node.js", "Express.js", "Django", "Flask", "FastAPI",
+    "Spring Boot", ".NET", "Pandas", "NumPy", "TensorFlow", "PyTorch", "scikit-learn",
+    "PostgreSQL", "MySQL", "MongoDB", "Redis", "Kafka", "Spark", "Hadoop", "GraphQL",
+    "AWS", "Azure", "GCP", "Docker", "Kubernetes", "Terraform", "Linux", "Git", "CI/CD",
+    "Machine Learning", "Deep Learning", "NLP", "Computer Vision", "Data Analysis",
+]
+
+# Async client so concurrent tool calls overlap; one pooled HTTP/2 connection set amortizes TLS
+anthropic_client = AsyncAnthropic(
+    api_key=ANTHROPIC_API_KEY,
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60),
+    ),
+)
 
 # Initialize FastMCP server
 mcp = FastMCP("job-search")
 
+# Logs go to stderr; stdout is the MCP stdio transport
+logger = logging.getLogger(__name__)
+
+
+# ---------------- LLM Response Cache ----------------
+def _open_cache(path: str) -> sqlite3.Connection:
+    """Open (or create) the sqlite-backed response cache in WAL mode."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, response TEXT, created_at REAL)"
+    )
+    return conn
+
+
+_cache_db = _open_cache(LLM_CACHE_PATH)
+
+
+def _normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and sort keys of embedded JSON objects so equivalent prompts hash equally."""
+    decoder = json.JSONDecoder()
+    parts = []
+    i = 0
+    while i < len(prompt):
+        if prompt[i] == "{":
+            try:
+                obj, end = decoder.raw_decode(prompt, i)
+                parts.append(json.dumps(obj, sort_keys=True, separators=(",", ":")))
+                i = end
+                continue
+            except ValueError:
+                pass
+        parts.append(prompt[i])
+        i += 1
+    return re.sub(r"\s+", " ", "".join(parts)).strip()
+
+
+def llm_cache(func):
+    """Serve repeated prompts from the sqlite cache instead of calling Claude again."""
+
+    @functools.wraps(func)
+    async def wrapper(prompt: str, max_tokens: int = PROFILE_MAX_TOKENS, file_id: Optional[str] = None):
+        # Every upload gets a fresh file id, so such entries could never be hit again
+        if file_id:
+            return await func(prompt, max_tokens, file_id)
+
+        key = hashlib.sha256(
+            f"{PROFILE_FINGERPRINT}|{max_tokens}|{_normalize_prompt(prompt)}".encode()
+        ).hexdigest()
+        row = _cache_db.execute("SELECT response FROM cache WHERE key=?", (key,)).fetchone()
+        if row is not None:
+            return orjson.loads(row[0])
+
+        response = await func(prompt, max_tokens, file_id)
+        with _cache_db:
+            _cache_db.execute(
+                "INSERT OR REPLACE INTO cache (key, response, created_at) VALUES (?, ?, ?)",
+                (key, orjson.dumps(response).decode(), time.time()),
+            )
+        return response
+
+    return wrapper
+
+
+# ---------------- Semantic Profile Cache ----------------
+class SemanticCache:
+    """Return a stored profile when a new CV is a near-duplicate of one already extracted.
+
+    Entries live in the sqlite cache DB, which several server processes share safely. Each
+    process mirrors the rows into an in-memory FAISS index and pulls in rows added by other
+    processes before every lookup. Only rows stored under the current profile fingerprint are
+    loaded, so changing the model, prompt or schema doesn't serve profiles made under the old ones.
+    """
+
+    def __init__(self, path: str, threshold: float, fingerprint: str):
+        self.threshold = threshold
+        self.fingerprint = fingerprint
+        self._db = _open_cache(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache "
+            "(id INTEGER PRIMARY KEY AUTOINCREMENT, embedding BLOB, profile TEXT, created_at REAL, "
+            "fingerprint TEXT)"
+        )
+        # Tables created before fingerprinting lack the column; their rows never match
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(semantic_cache)")}
+        if "fingerprint" not in columns:
+            self._db.execute("ALTER TABLE semantic_cache ADD COLUMN fingerprint TEXT")
+        self._model: Optional[SentenceTransformer] = None
+        self.index = faiss.IndexFlatIP(EMBEDDING_DIM)
+        self.profiles: list[dict] = []
+        self._last_id = 0
+        # embed/lookup/add run in worker threads (see extract_profile), so guard shared state
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed the whole CV: the model truncates at 256 word pieces, so encode fixed-size
+        word chunks and mean-pool them rather than fingerprinting only the header."""
+        # Load lazily so the MCP handshake isn't held up by model loading
+        with self._lock:
+            if self._model is None:
+                self._model = SentenceTransformer(EMBEDDING_MODEL)
+        words = text.split() or [""]
+        chunks = [
+            " ".join(words[i:i + EMBEDDING_CHUNK_WORDS])
+            for i in range(0, len(words), EMBEDDING_CHUNK_WORDS)
+        ]
+        vectors = self._model.encode(chunks, normalize_embeddings=True)
+        pooled = vectors.mean(axis=0)
+        return (pooled / np.linalg.norm(pooled)).astype(np.float32)
+
+    def _sync(self):
+        """Load rows written since the last sync (by this or any other process). Lock held."""
+        rows = self._db.execute(
+            "SELECT id, embedding, profile FROM semantic_cache "
+            "WHERE id > ? AND fingerprint = ? ORDER BY id",
+            (self._last_id, self.fingerprint),
+        ).fetchall()
+        if not rows:
+            return
+        self.index.add(np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]))
+        self.profiles.extend(orjson.loads(row[2]) for row in rows)
+        self._last_id = rows[-1][0]
+
+    def lookup(self, embedding: np.ndarray) -> Optional[dict]:
+        with self._lock:
+            self._sync()
+            if self.index.ntotal == 0:
+                return None
+            scores, ids = self.index.search(embedding[None, :], 1)
+            if scores[0, 0] >= self.threshold:
+                return self.profiles[ids[0, 0]]
+            return None
+
+    def add(self, embedding: np.ndarray, profile: dict):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO semantic_cache (embedding, profile, created_at, fingerprint) "
+                "VALUES (?, ?, ?, ?)",
+                (embedding.tobytes(), orjson.dumps(profile).decode(), time.time(), self.fingerprint),
+            )
+
+
+
+# ---------------- Local Profile Parser ----------------
+_SKILL_CANONICAL = {skill.lower(): skill for skill in SKILL_VOCAB}
+_SKILL_RE = re.compile(
+    r"(?<![\w+#.])("
+    + "|".join(re.escape(skill) for skill in sorted(SKILL_VOCAB, key=len, reverse=True))
+    + r")(?![\w+#])",
+    re.I,
+)
+_SKILLS_SECTION_RE = re.compile(r"(?im)^\s*(?:technical\s+)?skills?\s*[:\-]\s*(.+)$")
+_TITLE_RE = re.compile(
+    r"(?i)\b(?:(?:senior|junior|lead|staff|principal)\s+)?"
+    r"(?:software|backend|back-end|frontend|front-end|full[- ]?stack|data|machine learning|ml|"
+    r"devops|cloud|mobile|web|site reliability|qa|test)\s+"
+    r"(?:engineer|developer|scientist|analyst|architect)\b"
+)
+_YEARS_RE = re.compile(r"(?i)\b(\d{1,2})\+?\s*(?:years?|yrs?)\b")
+
+# Title and location are only trusted from the CV's header block, where they describe the
+# candidate rather than a past team or a university's city
+_INTRO_CHARS = 1000
+_TITLE_LINE_CHARS = 60
+
+_nlp = spacy.load("en_core_web_sm", disable=["parser", "lemmatizer"])
+
+
+def _intro(cv_text: str) -> str:
+    """Header block of the CV (name, title, contact): the text before the first section header."""
+    first_section = _SECTION_RE.search(cv_text)
+    return cv_text[:first_section.start() if first_section else len(cv_text)][:_INTRO_CHARS]
+
+
+def _cheap_parse(cv_text: str) -> tuple[dict, float]:
+    """Extract a profile with regexes + spaCy NER and score how complete it is."""
+    # Keyed on the lowercased name so "python" in a skills list doesn't repeat "Python"
+    skills = {}
+    for match in _SKILL_RE.finditer(cv_text):
+        skill = _SKILL_CANONICAL[match.group(1).lower()]
+        skills.setdefault(skill.lower(), skill)
+    for line in _SKILLS_SECTION_RE.findall(cv_text):
+        for item in re.split(r"[,;|•]", line):
+            item = item.strip()
+            if item and len(item) <= 40:
+                skills.setdefault(item.lower(), _SKILL_CANONICAL.get(item.lower(), item))
+    skills = list(skills.values())
+
+    intro = _intro(cv_text)
+    location = ""
+    organizations = []
+    for ent in _nlp(cv_text[:5000]).ents:
+        if ent.label_ in ("GPE", "LOC") and not location and ent.end_char <= len(intro):
+            location = ent.text.strip()
+        elif ent.label_ == "ORG" and ent.text not in organizations:
+            organizations.append(ent.text.strip())
+
+    # A title must open a short header line ("Senior Backend Engineer", "Data Scientist | Acme")
+    job_title = ""
+    for line in intro.splitlines():
+        line = line.strip(" \t•-|")
+        title_match = _TITLE_RE.match(line) if len(line) <= _TITLE_LINE_CHARS else None
+        if title_match:
+            job_title = title_match.group(0).title()
+            break
+
+    years = max((int(y) for y in _YEARS_RE.findall(cv_text)), default=0)
+    if years:
+        experience = f"{years}+ years of experience"
+        if organizations:
+            experience += f", including {', '.join(organizations[:2])}"
+    else:
+        experience = ""
+
+    profile = {
+        "skills": skills,
+        "experience": experience,
+        "location": location,
+        "jobTitle": job_title,
+    }
+    found = [len(skills) >= 3, bool(experience), bool(location), bool(job_title)]
+    return profile, sum(found) / len(found)
+
+
+# ---------------- Prompt Size Limiting ----------------
+# Rough tokens-per-char ratio for English text; avoids a tokenizer round-trip per CV
+_CHARS_PER_TOKEN = 4
+# A header is a short line: optional qualifier word, a section keyword, and up to two trailing
+# words ("Technical Skills", "EMPLOYMENT HISTORY", "Work History"), or keyword + ":" + content
+_SECTION_RE = re.compile(
+    r"(?im)^[ \t]*(?:[a-z]+[ \t]+)?"
+    r"(skills|experience|employment|history|education|projects|certifications|summary|profile|objective)\b"
+    r"(?:(?:[ \t]+[a-z&/]+){0,2}[ \t]*:?[ \t]*$|[ \t]*:)"
+)
+# Intro (contact/summary) first, then skills, recent experience, education, the rest
+_SECTION_PRIORITY = {
+    "": 0, "summary": 0, "profile": 0, "objective": 0,
+    "skills": 1,
+    "experience": 2, "employment": 2, "history": 2,
+    "education": 3,
+}
+# First-pass caps (share of the budget) so neither the intro nor a long job history can crowd
+# out the sections after them; leftover budget is handed back afterwards
+_SECTION_SHARE = {0: 0.15, 2: 0.6}
+
+
+def _shrink(cv_text: str, max_tokens: int = CV_TOKEN_BUDGET) -> str:
+    """Trim an oversized CV to about max_tokens, keeping the most useful sections."""
+    budget = max_tokens * _CHARS_PER_TOKEN
+    if len(cv_text) <= budget:
+        return cv_text
+
+    bounds = [0] + [m.start() for m in _SECTION_RE.finditer(cv_text)] + [len(cv_text)]
+    sections = []
+    for start, end in zip(bounds, bounds[1:]):
+        if start == end:
+            continue
+        header = _SECTION_RE.match(cv_text, start)
+        name = header.group(1).lower() if header else ""
+        sections.append((_SECTION_PRIORITY.get(name, 9), cv_text[start:end]))
+
+    # Greedily pack by priority; a section that doesn't fit keeps its head (most recent roles)
+    order = sorted(range(len(sections)), key=lambda i: (sections[i][0], i))
+    caps = {priority: int(budget * share) for priority, share in _SECTION_SHARE.items()}
+    kept = {i: "" for i in order}
+    for i in order:
+        priority, text = sections[i]
+        limit = min(budget, caps.get(priority, budget))
+        kept[i] = text[:limit]
+        budget -= len(kept[i])
+        if priority in caps:
+            caps[priority] -= len(kept[i])
+
+    # Hand whatever is left back to the capped sections, still in priority order
+    for i in order:
+        if budget <= 0:
+            break
+        text = sections[i][1]
+        extra = text[len(kept[i]):len(kept[i]) + budget]
+        kept[i] += extra
+        budget -= len(extra)
+    return "".join(kept[i] for i in sorted(kept))
+
 
 # ---------------- Helper Functions ----------------
-async def call_claude(prompt: str, max_tokens: int = 800) -> str:
-    """Send prompt to Claude and return raw text."""
-    response = anthropic.messages.create(
-        model="claude-3-7-sonnet-20250219",
+# Forcing this tool makes Claude return the profile as structured input instead of free text
+PROFILE_TOOL = {
+    "name": "emit_profile",
+    "description": "Record the profile extracted from the CV.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "skills": {"type": "array", "items": {"type": "string"}, "maxItems": 25},
+            "experience": {"type": "string", "description": "One short sentence."},
+            "location": {"type": "string"},
+            "jobTitle": {"type": "string"},
+        },
+        "required": ["skills", "experience", "location", "jobTitle"],
+    },
+}
+
+
+# Kept byte-identical across calls so Anthropic can serve it from the prompt cache
+PROFILE_INSTRUCTIONS = """
+    Extract the following from this CV:
+    - skills (list of strings, at most 25)
+    - job experience (one short summary sentence)
+    - location
+    - generate a 1-line jobTitle (based on skills + experience)
+
+    Report them with the emit_profile tool.
+    """
+
+
+# Hash of every setting that shapes an extracted profile; the server caches and the client's
+# upload cache are all keyed on it, so changing any of these retires their old entries
+PROFILE_FINGERPRINT = hashlib.sha256(orjson.dumps([
+    CLAUDE_MODEL, PROFILE_MAX_TOKENS, PROFILE_RETRY_MAX_TOKENS, PROFILE_INSTRUCTIONS, PROFILE_TOOL,
+    CV_TOKEN_BUDGET, CHEAP_PARSE_MIN_CONFIDENCE, SKILL_VOCAB, EMBEDDING_MODEL, SEMANTIC_CACHE_THRESHOLD,
+])).hexdigest()
+
+semantic_cache = SemanticCache(LLM_CACHE_PATH, SEMANTIC_CACHE_THRESHOLD, PROFILE_FINGERPRINT)
+
+
+async def _request_profile(cv_block: dict, max_tokens: int):
+    """Ask Claude for the profile of one CV block, forcing the emit_profile tool."""
+    return await anthropic_client.beta.messages.create(
+        model=CLAUDE_MODEL,
         max_tokens=max_tokens,
-        messages=[{"role": "user", "content": prompt}],
+        tools=[PROFILE_TOOL],
+        tool_choice={"type": "tool", "name": "emit_profile"},
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": PROFILE_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}},
+                    cv_block,
+                ],
+            }
+        ],
+        betas=[FILES_API_BETA],
     )
-    return response.content[0].text
+
+
+@llm_cache
+async def call_claude(prompt: str, max_tokens: int = PROFILE_MAX_TOKENS, file_id: Optional[str] = None) -> dict:
+    """Send the fixed profile instructions plus the CV (prompt text or uploaded file) to Claude
+    and return the profile it emits."""
+    if file_id:
+        cv_block = {"type": "document", "source": {"type": "file", "file_id": file_id}}
+    else:
+        cv_block = {"type": "text", "text": prompt}
+
+    response = await _request_profile(cv_block, max_tokens)
+    if response.stop_reason == "max_tokens" and max_tokens < PROFILE_RETRY_MAX_TOKENS:
+        logger.info("Profile hit max_tokens=%d, retrying with %d", max_tokens, PROFILE_RETRY_MAX_TOKENS)
+        response = await _request_profile(cv_block, PROFILE_RETRY_MAX_TOKENS)
+
+    # A max_tokens cut-off yields a partial tool input; raising keeps it out of every cache
+    profile = response.content[0].input if response.content else {}
+    missing = [key for key in PROFILE_TOOL["input_schema"]["required"] if key not in profile]
+    if response.stop_reason != "tool_use" or missing:
+        raise ValueError(
+            f"Claude returned an incomplete profile (stop_reason={response.stop_reason}, missing={missing})"
+        )
+    return profile
+
+
+# ---------------- MCP Resources ----------------
+@mcp.resource("profile://fingerprint")
+def profile_fingerprint() -> str:
+    """Hash of every setting that shapes an extracted profile; clients key their caches on it."""
+    return PROFILE_FINGERPRINT
+
+
+@mcp.resource("skills://vocab")
+def skill_vocab() -> str:
+    """The skill vocabulary as a JSON list; the web client matches job descriptions against it."""
+    return orjson.dumps(SKILL_VOCAB).decode()
 
 
 # ---------------- MCP Tools ----------------
 @mcp.tool()
-async def extract_profile(cv_text: str) -> dict:
-    print("somebody called me ")
-    """Extract skills, experience, location, and job title from CV text.
+async def extract_profile(cv_text: str = "", file_id: str = "") -> dict:
+    """Extract skills, experience, location, and job title from a CV.
 
     Args:
         cv_text: The raw text of the CV
+        file_id: Anthropic Files API id of an uploaded CV, used when cv_text is empty
     """
-    prompt = f"""
-    Extract the following from this CV:
-    - skills (list of strings)
-    - job experience (summary sentence)
-    - location
-    - generate a 1-line jobTitle (based on skills + experience)
+    if not cv_text:
+        if not file_id:
+            return {"error": "Provide cv_text or file_id"}
+        # No local text to cache on or parse; Claude reads the document directly
+        logger.debug("extract_profile called with file %s", file_id)
+        try:
+            return await call_claude("", file_id=file_id)
+        except ValueError as e:
+            return {"error": str(e)}
 
-    Respond ONLY in valid JSON with this structure:
-    {{
-        "skills": [...],
-        "experience": "...",
-        "location": "...",
-        "jobTitle": "..."
-    }}
+    logger.debug("extract_profile called (%d chars)", len(cv_text))
+    # CPU-bound steps (embedding, NER, index writes) run off the event loop so concurrent
+    # tool calls keep being served
 
+    # Near-identical CVs (whitespace, small edits) reuse an earlier extraction
+    embedding = await asyncio.to_thread(semantic_cache.embed, cv_text)
+    cached = await asyncio.to_thread(semantic_cache.lookup, embedding)
+    if cached is not None:
+        return cached
+
+    # Well-formatted CVs parse locally in ~100ms; only ambiguous ones need Claude
+    profile, confidence = await asyncio.to_thread(_cheap_parse, cv_text)
+    if confidence >= CHEAP_PARSE_MIN_CONFIDENCE:
+        return profile
+
+    prompt = f"""
     CV Content:
-    {cv_text}
+    {_shrink(cv_text)}
     """
-    
-    print("The prompt is : ", prompt)
 
-    raw = await call_claude(prompt)
     try:
-        profile = json.loads(raw.strip())
-        print("sending profile ", profile)
-        # Debug print in terminal
-        print("\n===== Extracted Profile =====\n")
-        print(json.dumps(profile, indent=2))
-        print("\n=============================\n")
-        return profile
-    except Exception:
-        print("\n❌ Claude did not return valid JSON")
-        print("Raw output:", raw)
-        return {"error": "Claude did not return valid JSON", "raw": raw}
+        profile = await call_claude(prompt)
+    except ValueError as e:
+        logger.warning("%s", e)
+        return {"error": str(e)}
+    await asyncio.to_thread(semantic_cache.add, embedding, profile)
+    # Only pay for pretty-printing when debug logging is actually on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Extracted profile:\n%s", orjson.dumps(profile, option=orjson.OPT_INDENT_2).decode())
+    return profile
+
 
 # ---------------- Main ----------------
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
     mcp.run(transport="stdio")
@@ -1,31 +1,279 @@
 import asyncio
+import io
 import sys
+import logging
 from typing import Optional
 from contextlib import AsyncExitStack
-import json
 import os
-import requests
-
-from flask import Flask, request, jsonify, render_template
+import time
+import sqlite3
+import atexit
+import shlex
+import hashlib
+import zipfile
+import tempfile
+import threading
+
+import ahocorasick
+import httpx
+import orjson
+from cachetools import TTLCache
+from lxml import etree
+from flask import Flask, Request, request, jsonify, render_template
+from flask.json.provider import JSONProvider
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
 import anthropic
+import pymupdf
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 SCRAPINGDOG_API_KEY = os.getenv("SCRAPINGDOG_API_KEY")
+SCRAPINGDOG_JOBS_URL = "https://api.scrapingdog.com/google_jobs"
+MCP_SERVER_SCRIPT = os.getenv("MCP_SERVER_SCRIPT")
+# Command the server script is appended to. By default a .py server runs in its own uv project
+# (the directory holding the script), since it needs faiss, spaCy and sentence-transformers,
+# which this client's environment doesn't install. Set e.g. "/path/to/venv/bin/python" to
+# use a prepared interpreter instead.
+MCP_SERVER_COMMAND = os.getenv("MCP_SERVER_COMMAND")
+# Stdio server subprocesses per gunicorn worker; the host runs WEB_CONCURRENCY * MCP_POOL_SIZE
+# of them in total, each with its own spaCy/MiniLM models loaded, so keep this small
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+
+# Bump when client-side text extraction changes what gets sent to extract_profile
+EXTRACTION_CACHE_VERSION = 1
+# PDFs with less text than this are treated as scanned and sent to Claude as a document
+PDF_MIN_TEXT_CHARS = 200
+
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cache.sqlite3"),
+)
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(JSONProvider):
+    """Serve jsonify() responses through orjson."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+class DiskSpoolingRequest(Request):
+    """Spool large uploads to a named temp file, so PyMuPDF can open them by path instead of
+    each request thread holding a copy of up to 10 MB in memory."""
+
+    spool_threshold = 500 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is None or total_content_length > self.spool_threshold:
+            return tempfile.NamedTemporaryFile("wb+")
+        return io.BytesIO()
+
 
 app = Flask(__name__)
+app.request_class = DiskSpoolingRequest
+app.json = OrjsonProvider(app)
+# Reject oversized CVs before Werkzeug buffers them
+app.config["MAX_CONTENT_LENGTH"] = 10 * 1024 * 1024
+
+
+# -------- LLM Response Cache --------
+# jobSearch and mcp-client ship as separate projects with no shared package, so this
+# deliberately mirrors jobSearch._open_cache; keep the two schemas in step
+def _open_cache(path: str) -> sqlite3.Connection:
+    """Open (or create) the sqlite cache of extracted profiles in WAL mode."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, response TEXT, created_at REAL)"
+    )
+    return conn
+
+
+_cache_db = _open_cache(LLM_CACHE_PATH)
+# One connection shared by every gthread request thread; sqlite3 requires callers to serialize
+_cache_lock = threading.Lock()
+
+
+def cache_get(key: str) -> Optional[str]:
+    with _cache_lock:
+        row = _cache_db.execute("SELECT response FROM cache WHERE key=?", (key,)).fetchone()
+    return row[0] if row is not None else None
+
+
+def cache_put(key: str, response: str):
+    with _cache_lock, _cache_db:
+        _cache_db.execute(
+            "INSERT OR REPLACE INTO cache (key, response, created_at) VALUES (?, ?, ?)",
+            (key, response, time.time()),
+        )
+
+
+# -------- Background Event Loop --------
+# A single long-lived loop lets async clients keep their connection pools across requests
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, daemon=True).start()
+
+
+def run_async(coro, timeout: Optional[float] = 60):
+    """Run a coroutine on the background loop and block until it finishes."""
+    fut = asyncio.run_coroutine_threadsafe(coro, _loop)
+    try:
+        return fut.result(timeout=timeout)
+    except TimeoutError:
+        # Otherwise the coroutine keeps running (and holding e.g. a pooled MCP session)
+        fut.cancel()
+        raise
+
+
+# -------- Job Search --------
+# Transport-level retries cover failed connects; _RETRY_STATUSES are retried in fetch_jobs
+_http = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    ),
+    timeout=10.0,
+    headers={"User-Agent": "mcp-job-search/1.0"},
+)
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+
+async def fetch_jobs(query: str, country: str, retries: int = 2, backoff: float = 0.2) -> list[dict]:
+    params = {"api_key": SCRAPINGDOG_API_KEY, "query": query, "country": country}
+    for attempt in range(retries + 1):
+        r = await _http.get(SCRAPINGDOG_JOBS_URL, params=params)
+        if r.status_code not in _RETRY_STATUSES or attempt == retries:
+            break
+        await asyncio.sleep(backoff * 2 ** attempt)
+    if r.status_code != 200:
+        # Raise so search_jobs skips caching this (partial) result
+        raise RuntimeError(f"Job API request failed: {r.status_code}")
+    return orjson.loads(r.content).get("jobs_results", [])
+
+
+# One automaton over the whole vocabulary: a single pass per description finds every skill
+def build_skill_automaton(vocab: list[str]) -> ahocorasick.Automaton:
+    """Aho-Corasick automaton over the lowercased vocabulary, mapping back to canonical names."""
+    automaton = ahocorasick.Automaton()
+    for skill in vocab:
+        automaton.add_word(skill.lower(), skill)
+    automaton.make_automaton()
+    return automaton
+
+
+# Replaced with the server's vocabulary once the MCP pool connects
+_skill_automaton = ahocorasick.Automaton()
+
+
+def match_skills(text: str) -> set[str]:
+    """Vocabulary skills mentioned in text, matched on whole words only."""
+    if _skill_automaton.kind != ahocorasick.AHOCORASICK:
+        return set()
+    lowered = text.lower()
+    matched = set()
+    for end, skill in _skill_automaton.iter(lowered):
+        start = end - len(skill) + 1
+        before = lowered[start - 1] if start > 0 else " "
+        after = lowered[end + 1] if end + 1 < len(lowered) else " "
+        # Reject hits inside longer tokens ("java" in "javascript", "git" in "digital")
+        if not (before.isalnum() or before in "+#.") and not (after.isalnum() or after in "+#"):
+            matched.add(skill)
+    return matched
+
+
+def rank_jobs(jobs: list[dict], skills: list[str], limit: int = 5) -> list[dict]:
+    """Order jobs by how many of the candidate's skills their description mentions."""
+    wanted = {str(s).lower() for s in skills}
+    ranked = []
+    for job in jobs:
+        overlap = sorted(s for s in job["skills"] if s.lower() in wanted)
+        ranked.append({**{k: v for k, v in job.items() if k != "skills"}, "matchedSkills": overlap})
+    ranked.sort(key=lambda job: len(job["matchedSkills"]), reverse=True)
+    return ranked[:limit]
+
+
+# Results per (role, country); only touched from the background loop, so no locking needed
+_jobs_cache = TTLCache(maxsize=1024, ttl=30 * 60)
+_TITLE_NOUNS = ("engineer", "developer", "scientist", "analyst", "architect", "manager", "designer", "consultant")
+
+
+def _variants(job_role: str) -> list[str]:
+    """Search-term variants of a job role, to widen recall."""
+    variants = [job_role]
+    lowered = job_role.lower()
+    if not lowered.startswith("senior "):
+        variants.append(f"Senior {job_role}")
+    if not lowered.endswith(_TITLE_NOUNS):
+        variants.append(f"{job_role} Engineer")
+    return variants
+
+
+async def search_jobs(job_role: str, country: str) -> list[dict]:
+    """Query the job API for every role variant concurrently and merge the results."""
+    cache_key = (job_role.lower(), country.lower())
+    if cache_key in _jobs_cache:
+        return _jobs_cache[cache_key]
+
+    results = await asyncio.gather(
+        *[fetch_jobs(q, country) for q in _variants(job_role)], return_exceptions=True
+    )
+
+    jobs_data = []
+    seen_links = set()
+    failed = False
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Job API error: %s", result)
+            failed = True
+            continue
+        for job in result:
+            link = job.get("share_link", "#")
+            if link in seen_links:
+                continue
+            seen_links.add(link)
+            description = job.get("description", "N/A")
+            jobs_data.append({
+                "title": job.get("title", "N/A"),
+                "company": job.get("company_name", "N/A"),
+                "location": job.get("location", "N/A"),
+                "link": link,
+                "description": description[:300] + "...",
+                # Matched once here against the full text, so cached hits never re-scan
+                "skills": match_skills(description),
+            })
+
+    # Don't pin a partial result for the whole TTL
+    if not failed:
+        _jobs_cache[cache_key] = jobs_data
+    return jobs_data
+
 
 # -------- MCP Web Client --------
 class MCPWebClient:
+    """One stdio session, entered and exited inside a single owner task.
+
+    The stdio/ClientSession contexts use anyio task groups, which must be exited from the
+    same task that entered them; otherwise cleanup raises and the subprocess is leaked.
+    """
+
     def __init__(self):
         self.session: Optional[ClientSession] = None
-        self.exit_stack = AsyncExitStack()
+        self._task: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Future] = None
+        self._closing: Optional[asyncio.Event] = None
 
     async def connect_to_server(self, server_script_path: str):
         is_python = server_script_path.endswith(".py")
@@ -33,25 +281,222 @@ class MCPWebClient:
         if not (is_python or is_js):
             raise ValueError("Server script must be a .py or .js file")
 
-        command = "python" if is_python else "node"
-        server_params = StdioServerParameters(command=command, args=[server_script_path], env=None)
+        if MCP_SERVER_COMMAND:
+            command, *args = shlex.split(MCP_SERVER_COMMAND)
+        elif is_python:
+            project_dir = os.path.dirname(os.path.abspath(server_script_path))
+            command, args = "uv", ["run", "--project", project_dir, "python"]
+        else:
+            command, args = "node", []
+        server_params = StdioServerParameters(command=command, args=[*args, server_script_path], env=None)
 
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
-        await self.session.initialize()
+        self._connected = asyncio.get_running_loop().create_future()
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(self._own_session(server_params))
+        await self._connected
 
         response = await self.session.list_tools()
-        print("✅ Connected to server with tools:", [t.name for t in response.tools])
+        logger.info("Connected to server with tools: %s", [t.name for t in response.tools])
+
+    async def _own_session(self, server_params: StdioServerParameters):
+        try:
+            async with AsyncExitStack() as stack:
+                self.stdio, self.write = await stack.enter_async_context(stdio_client(server_params))
+                session = await stack.enter_async_context(ClientSession(self.stdio, self.write))
+                await session.initialize()
+                self.session = session
+                self._connected.set_result(None)
+                await self._closing.wait()
+        except Exception as e:
+            if not self._connected.done():
+                self._connected.set_exception(e)
+            else:
+                logger.warning("MCP session closed with error: %s", e)
+        finally:
+            self.session = None
+            if not self._connected.done():
+                self._connected.cancel()
+
+    async def cleanup(self):
+        if self._task is None:
+            return
+        self._closing.set()
+        await self._task
+
+
+class MCPClientPool:
+    """Spread tool calls over several stdio sessions so one subprocess pipe isn't a mutex."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.server_script_path: Optional[str] = None
+        self.clients: list[MCPWebClient] = []
+        self._idle: Optional[asyncio.Queue] = None
+
+    async def connect(self, server_script_path: str):
+        self.server_script_path = server_script_path
+        self._idle = asyncio.Queue()
+        self.clients = [MCPWebClient() for _ in range(self.size)]
+        await asyncio.gather(*[c.connect_to_server(server_script_path) for c in self.clients])
+        for c in self.clients:
+            self._idle.put_nowait(c)
+
+    async def call_tool(self, name: str, arguments: dict):
+        mcp_client = await self._idle.get()
+        try:
+            try:
+                await asyncio.wait_for(mcp_client.session.send_ping(), 5)
+            except Exception as e:
+                logger.warning("MCP session unhealthy (%s), reconnecting", e)
+                mcp_client = await self._reconnect(mcp_client)
+            return await mcp_client.session.call_tool(name, arguments)
+        finally:
+            self._idle.put_nowait(mcp_client)
+
+    async def read_resource(self, uri: str) -> str:
+        mcp_client = await self._idle.get()
+        try:
+            result = await mcp_client.session.read_resource(uri)
+            return result.contents[0].text
+        finally:
+            self._idle.put_nowait(mcp_client)
+
+    async def _reconnect(self, old: MCPWebClient) -> MCPWebClient:
+        if old in self.clients:
+            self.clients.remove(old)
+            try:
+                await old.cleanup()
+            except Exception as e:
+                logger.warning("MCP cleanup error: %s", e)
+        new = MCPWebClient()
+        await new.connect_to_server(self.server_script_path)
+        self.clients.append(new)
+        return new
 
     async def cleanup(self):
-        await self.exit_stack.aclose()
+        for c in self.clients:
+            await c.cleanup()
 
 
-mcp_client = MCPWebClient()
+mcp_pool = MCPClientPool(MCP_POOL_SIZE)
 
-# Initialize Anthropic client
-client = anthropic.Anthropic()
+# Connect once at worker startup so the MCP stdio subprocesses stay warm across requests
+# Settings the server extracts profiles with, folded into the client's cache keys
+profile_fingerprint = ""
+if MCP_SERVER_SCRIPT:
+    run_async(mcp_pool.connect(MCP_SERVER_SCRIPT), timeout=None)
+    profile_fingerprint = run_async(mcp_pool.read_resource("profile://fingerprint"))
+    # The server owns the skill vocabulary, so job matching uses the same list as extraction
+    _skill_automaton = build_skill_automaton(orjson.loads(run_async(mcp_pool.read_resource("skills://vocab"))))
+
+
+async def _close_clients():
+    await _http.aclose()
+    await client.close()
+    await mcp_pool.cleanup()
+
+
+@atexit.register
+def _shutdown():
+    try:
+        run_async(_close_clients(), timeout=10)
+    except Exception as e:
+        logger.warning("Shutdown error: %s", e)
+    _loop.call_soon_threadsafe(_loop.stop)
+
+
+# Anthropic client for Files API uploads (async, pooled HTTP/2; only ever used on the background loop)
+client = anthropic.AsyncAnthropic(
+    http_client=anthropic.DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60),
+    ),
+)
+
+
+def hash_stream(stream, chunk_size: int = 64 * 1024) -> str:
+    """SHA-256 a file stream in fixed-size chunks, then rewind it."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W_P = f"{{{_W_NS}}}p"
+_W_R = f"{{{_W_NS}}}r"
+# Run children that carry text: literal text, tabs and line breaks. Only direct children of a
+# run count; w:pPr/w:tabs also holds w:tab elements, but those define tab stops
+_W_TEXT_NODES = {f"{{{_W_NS}}}t": None, f"{{{_W_NS}}}tab": "\t", f"{{{_W_NS}}}br": "\n"}
+
+
+def extract_text_from_docx(stream) -> str:
+    """Stream paragraph text out of word/document.xml without building python-docx's object model."""
+    parts = []
+    with zipfile.ZipFile(stream) as z, z.open("word/document.xml") as f:
+        for _, el in etree.iterparse(f, tag=_W_P):
+            parts.append("".join(
+                (node.text or "") if _W_TEXT_NODES[node.tag] is None else _W_TEXT_NODES[node.tag]
+                for run in el.iter(_W_R)
+                for node in run
+                if node.tag in _W_TEXT_NODES
+            ))
+            # Free finished paragraphs and detach everything before them, so memory stays flat
+            # regardless of document size
+            el.clear()
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+    return "\n".join(parts)
+
+
+# Plain "text" mode (no layout sorting or image blocks), with ligatures expanded so "ﬁ" in
+# "Proﬁcient" or "Conﬁguration" reaches the skill/title regexes as "fi"
+_PDF_TEXT_FLAGS = pymupdf.TEXTFLAGS_TEXT & ~pymupdf.TEXT_PRESERVE_LIGATURES
+
+
+def extract_text_from_pdf(stream) -> str:
+    """Return the text layer of a PDF and rewind the stream; scanned pages yield nothing."""
+    name = getattr(stream, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        # Spooled to disk by DiskSpoolingRequest: let MuPDF read the file itself
+        doc = pymupdf.open(name, filetype="pdf")
+    else:
+        doc = pymupdf.open(stream=stream.read(), filetype="pdf")
+    # Pages are read serially: CVs run a few pages, well under the cost of a process pool
+    with doc:
+        text = "\n".join(page.get_text("text", flags=_PDF_TEXT_FLAGS) for page in doc)
+    stream.seek(0)
+    return text
+
+
+async def extract_cv(filename: str, stream, mimetype: Optional[str]) -> dict:
+    """Have the MCP server's extract_profile tool extract the CV's fields."""
+    name = filename.lower()
+    if name.endswith(".docx"):
+        # Document blocks don't accept DOCX, so send its text instead
+        cv_text = await asyncio.to_thread(extract_text_from_docx, stream)
+        return await _call_extract_profile({"cv_text": cv_text})
+
+    if name.endswith(".pdf"):
+        # Sending text lets the server use its semantic cache, local parser and prompt trimming;
+        # scanned PDFs have no text layer and are uploaded so Claude can read the page images
+        cv_text = await asyncio.to_thread(extract_text_from_pdf, stream)
+        if len(cv_text.strip()) >= PDF_MIN_TEXT_CHARS:
+            return await _call_extract_profile({"cv_text": cv_text})
+
+    # Let the SDK read the (possibly disk-spooled) upload in 1 MiB chunks instead of one buffer
+    uploaded_file = await client.beta.files.upload(
+        file=(filename, io.BufferedReader(stream, buffer_size=1 << 20), mimetype or "application/octet-stream")
+    )
+    return await _call_extract_profile({"file_id": uploaded_file.id})
+
+
+async def _call_extract_profile(arguments: dict) -> dict:
+    result = await mcp_pool.call_tool("extract_profile", arguments)
+    if result.isError:
+        raise RuntimeError(f"extract_profile failed: {result.content}")
+    return orjson.loads(result.content[0].text)
 
 
 # -------- Flask Routes --------
@@ -60,6 +505,11 @@ def index():
     return render_template("index.html")
 
 
+@app.errorhandler(413)
+def file_too_large(e):
+    return jsonify({"error": "File too large (max 10 MB)"}), 413
+
+
 @app.route("/upload", methods=["POST"])
 def upload_file():
     if "file" not in request.files:
@@ -69,99 +519,42 @@ def upload_file():
     if file.filename == "":
         return jsonify({"error": "Empty filename"}), 400
 
-    # Upload file to Claude API
-    uploaded_file = client.beta.files.upload(
-        file=(file.filename, file.stream, file.mimetype or "application/octet-stream")
-    )
-
-    file_id = uploaded_file.id
-
-    # Extraction prompt
-    extraction_prompt = """
-    Extract ONLY the following fields from this CV:
-
-    {
-      "skills": [...],      // list of strings
-      "location": "...",    // string
-      "experience": "...",  // string (summary of job experience)
-      "jobRole": "..."      // probable job title this candidate is best suited for , based on his experience and the skill.
-    }
-
-    Rules:
-    - If any field is missing, set its value to "N/A".
-    - You will decide the Job role based on the candidate experience and the skills and you will return the best single job suited for the candidate.
-    - Return ONLY valid JSON, nothing else.
-    """
-
-    response = client.beta.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1024,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": extraction_prompt},
-                    {"type": "document", "source": {"type": "file", "file_id": file_id}},
-                ],
-            }
-        ],
-        betas=["files-api-2025-04-14"],
-    )
-
-    # Extract Claude raw JSON string
-    extracted_text = response.content[0].text if response.content else ""
-
-    # Remove ```json ... ``` wrappers
-    cleaned_text = (
-        extracted_text.replace("```json", "")
-        .replace("```", "")
-        .strip()
-    )
-
-    try:
-        parsed = json.loads(cleaned_text)
-    except Exception:
-        parsed = {"skills": ["N/A"], "location": "N/A", "experience": "N/A", "jobRole": "N/A"}
+    # Same CV bytes -> same extraction, so skip both the upload and the tool call on a hit
+    file_hash = hash_stream(file.stream)
+    cache_key = hashlib.sha256(
+        f"extract_profile|{EXTRACTION_CACHE_VERSION}|{profile_fingerprint}|{file_hash}".encode()
+    ).hexdigest()
+
+    cached = cache_get(cache_key)
+    if cached is not None:
+        parsed = orjson.loads(cached)
+    else:
+        parsed = run_async(extract_cv(file.filename, file.stream, file.mimetype))
+        if "error" in parsed:
+            # Searching jobs on N/A fields would hide the failure behind generic results
+            logger.warning("CV extraction failed: %s", parsed["error"])
+            return jsonify({"error": f"Could not extract the CV: {parsed['error']}"}), 502
+        cache_put(cache_key, orjson.dumps(parsed).decode())
 
     # Extract fields safely
-    print("output jobs : ", parsed)
+    logger.debug("extracted profile: %s", parsed)
     skills = parsed.get("skills", ["N/A"])
     if not isinstance(skills, list):
         skills = [skills] if skills else ["N/A"]
 
-    location = parsed.get("location", "N/A")
-    experience = parsed.get("experience", "N/A")
-    jobRole = parsed.get("jobRole", "N/A")
+    location = parsed.get("location") or "N/A"
+    experience = parsed.get("experience") or "N/A"
+    jobRole = parsed.get("jobTitle") or "N/A"
 
-    # ✅ Job Search API request
-    params = {
-        "api_key": SCRAPINGDOG_API_KEY,
-        "query": jobRole if jobRole != "N/A" else "Software Engineer",
-        "country": location if location != "N/A" else "us",
-    }
-    
-    print("passing params : ", params)
+    # ✅ Job Search API requests (role variants fetched concurrently, cached per role + country)
+    query = jobRole if jobRole != "N/A" else "Software Engineer"
+    country = location if location != "N/A" else "us"
 
-    jobs_data = []
-    try:
-        r = requests.get("https://api.scrapingdog.com/google_jobs", params=params)
-        if r.status_code == 200:
-            job_json = r.json()
-            # Extract first few jobs only
-            for job in job_json.get("jobs_results", [])[:5]:
-                jobs_data.append({
-                    "title": job.get("title", "N/A"),
-                    "company": job.get("company_name", "N/A"),
-                    "location": job.get("location", "N/A"),
-                    "link": job.get("share_link", "#"),
-                    "description": job.get("description", "N/A")[:300] + "..."
-                })
-        else:
-            print(f"Job API request failed: {r.status_code}")
-    except Exception as e:
-        print("Job API error:", str(e))
-        
-    print("Jobs I got : ", jobs_data)
+    logger.debug("searching jobs for: %s (%s)", query, country)
+
+    jobs_data = rank_jobs(run_async(search_jobs(query, country)), skills)
+
+    logger.debug("found %d jobs", len(jobs_data))
 
     # ✅ Return extracted + job results
     return jsonify({
@@ -173,14 +566,22 @@ def upload_file():
     })
 
 
-async def main():
+if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python client.py <path_to_server_script>")
+        print("The server runs via `uv run --project <script dir>`; set MCP_SERVER_COMMAND to override.")
         sys.exit(1)
 
-    await mcp_client.connect_to_server(sys.argv[1])
-    app.run(host="0.0.0.0", port=5000, debug=True)
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
+    # Serve with gunicorn; every worker imports this module and connects its own MCP sessions,
+    # so WEB_CONCURRENCY * MCP_POOL_SIZE server subprocesses are started in total
+    os.environ["MCP_SERVER_SCRIPT"] = os.path.abspath(sys.argv[1])
+    os.execvp("gunicorn", [
+        "gunicorn",
+        "--workers", os.getenv("WEB_CONCURRENCY", "4"),
+        "--worker-class", "gthread",
+        "--threads", "8",
+        "--timeout", "120",
+        "--bind", "0.0.0.0:5000",
+        "--chdir", os.path.dirname(os.path.abspath(__file__)),
+        "client:app",
+    ])